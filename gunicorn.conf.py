@@ -0,0 +1,9 @@
+"""gunicorn settings, picked up automatically when gunicorn starts from the repo root (the Procfile does)."""
+
+
+def on_starting(server):
+    # runs once in the master, before any worker forks: upgrade an older data/apod.db here so
+    # the workers only ever open it read-only
+    from src.web_app import ensure_read_schema
+
+    ensure_read_schema()
@@ -7,7 +7,10 @@ This code is a convenience runner. It executes:
 3) Optional Mars photos sample
 4) Pytest
 
-It stops on the first failure so it is easy to see what broke.
+Data quality and the Mars sample don't depend on each other, so they run at the same
+time right after the fetch (their output may interleave). Pytest always runs last.
+
+It stops on the first failing stage so it is easy to see what broke.
 """
 
 import argparse
@@ -19,15 +22,25 @@ ROOT = Path(__file__).resolve().parent
 PYTHON = sys.executable
 
 
-def run(title: str, cmd: list[str]) -> int:
+def start(title: str, cmd: list[str]) -> subprocess.Popen:
     print(f"\n=== {title} ===")
     print("Command:", " ".join(cmd))
-    result = subprocess.run(cmd, cwd=ROOT)
-    if result.returncode == 0:
+    return subprocess.Popen(cmd, cwd=ROOT)
+
+
+def finish(title: str, proc: subprocess.Popen) -> int:
+    returncode = proc.wait()
+    if returncode == 0:
         print(f"{title} completed successfully.\n")
     else:
-        print(f"{title} failed with code {result.returncode}.\n")
-    return result.returncode
+        print(f"{title} failed with code {returncode}.\n")
+    return returncode
+
+
+def run_stage(steps: list[tuple[str, list[str]]]) -> int:
+    """Start every step of a stage at once, wait for all of them, return the failure count."""
+    procs = [(title, start(title, cmd)) for title, cmd in steps]
+    return sum(1 for title, proc in procs if finish(title, proc) != 0)
 
 
 def main() -> None:
@@ -48,7 +61,8 @@ def main() -> None:
     parser.add_argument("--api-key", default=None, help="NASA API key; falls back to env/NASA_APOD_FALLBACK inside scripts.")
     args = parser.parse_args()
 
-    steps: list[tuple[str, list[str]]] = []
+    # each stage is a list of independent steps that can run concurrently
+    stages: list[list[tuple[str, list[str]]]] = []
 
     pipeline_cmd = [
         PYTHON,
@@ -59,7 +73,7 @@ def main() -> None:
     ]
     if args.api_key:
         pipeline_cmd += ["--api-key", args.api_key]
-    steps.append(("Fetch APOD", pipeline_cmd))
+    stages.append([("Fetch APOD", pipeline_cmd)])
 
     dq_cmd = [
         PYTHON,
@@ -72,7 +86,7 @@ def main() -> None:
         "--report-md",
         str(ROOT / "data" / "data_quality_report.md"),
     ]
-    steps.append(("Data Quality", dq_cmd))
+    parallel: list[tuple[str, list[str]]] = [("Data Quality", dq_cmd)]
 
     if not args.skip_mars:
         mars_cmd = [
@@ -90,15 +104,15 @@ def main() -> None:
             mars_cmd += ["--sol", str(args.mars_sol)]
         if args.api_key:
             mars_cmd += ["--api-key", args.api_key]
-        steps.append(("Mars Photos (optional)", mars_cmd))
+        parallel.append(("Mars Photos (optional)", mars_cmd))
+    stages.append(parallel)
 
-    steps.append(("Pytest", [PYTHON, "-m", "pytest", "-q"]))
+    stages.append([("Pytest", [PYTHON, "-m", "pytest", "-q"])])
 
     failures = 0
-    for title, cmd in steps:
-        code = run(title, cmd)
-        if code != 0:
-            failures += 1
+    for steps in stages:
+        failures += run_stage(steps)
+        if failures:
             break
 
     if failures:
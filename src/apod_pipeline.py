@@ -6,21 +6,33 @@ my notes:
 - "SQLite" is a single-file database (here: `data/apod.db`).
 - "Upsert" means: insert a new row, or update the existing row if that date already exists.
 - The NASA API can rate-limit requests. If I hit a rate limit, I should wait and retry.
+- To avoid hitting the limit in the first place, every call takes a token from a token bucket
+  refilled at the key's hourly quota, and 429 retries back off exponentially (with a little jitter).
+- Calls go through one shared `requests.Session` (see `src/http_session.py`), which reuses the
+  TLS connection and retries network errors / 5xx responses on its own.
+- Each entry's VADER sentiment is computed once here and stored in `sentiment_compound`, so the
+  web UI doesn't have to re-score explanations on every page load.
 """
 
 import argparse
 import datetime as dt
+import itertools
 import logging
+import random
 import sqlite3
 import sys
 import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sized, Tuple
 
 import requests
 
 try:
     from src.config import get_env
+    from src.http_session import build_session
+    from src.sentiment import BatchScorer, compound_many
+    from src.schema import bump_generation, create_indexes, drop_indexes, ensure_schema
 except ModuleNotFoundError:
     # Support running as a script: `python src/apod_pipeline.py ...`
     # In that case, Python's import root is `src/`, so `import src.*` fails.
@@ -28,17 +40,98 @@ except ModuleNotFoundError:
     if str(project_root) not in sys.path:
         sys.path.insert(0, str(project_root))
     from src.config import get_env
+    from src.http_session import build_session
+    from src.sentiment import BatchScorer, compound_many
+    from src.schema import bump_generation, create_indexes, drop_indexes, ensure_schema
 
 API_URL = "https://api.nasa.gov/planetary/apod"
 DEFAULT_API_KEY = get_env("NASA_API_KEY", "DEMO_KEY")
 logger = logging.getLogger(__name__)
+# keep-alive connection pool shared by every call; retries connection errors and 5xx itself
+_SESSION = build_session()
+
+APOD_COLUMNS = (
+    "date",
+    "title",
+    "explanation",
+    "media_type",
+    "url",
+    "hdurl",
+    "thumbnail_url",
+    "service_version",
+    "copyright",
+)
+# one APOD entry as a tuple in APOD_COLUMNS order
+ApodRow = Tuple[Any, ...]
+EXPLANATION_IDX = APOD_COLUMNS.index("explanation")
+# what actually gets written: the API fields plus the VADER score computed at ingest
+UPSERT_COLUMNS = APOD_COLUMNS + ("sentiment_compound",)
+# api.nasa.gov hourly limits: DEMO_KEY is shared and tiny, a personal key gets 1000/hour.
+DEMO_KEY_HOURLY_QUOTA = 30
+API_KEY_HOURLY_QUOTA = 1000
+MAX_BACKOFF_SECONDS = 60
+# SQLite's default SQLITE_MAX_VARIABLE_NUMBER is 999 on older builds; size chunks to stay under it.
+UPSERT_CHUNK_ROWS = 999 // len(UPSERT_COLUMNS)
+# above this many rows it is cheaper to rebuild the secondary indexes once than to maintain them per row
+BULK_THRESHOLD = 500
+
+
+class _TokenBucket:
+    """Client-side pacing: `rate` tokens/second refill, at most `capacity` stored."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def acquire(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            wait_seconds = (1 - self.tokens) / self.rate
+            logger.info("Pacing NASA API calls, waiting %.1f seconds", wait_seconds)
+            time.sleep(wait_seconds)
+            self.tokens = 1
+            self.updated = time.monotonic()
+        self.tokens -= 1
+
+
+_BUCKETS: Dict[str, _TokenBucket] = {}
+
+
+def _bucket_for(api_key: str) -> _TokenBucket:
+    if api_key not in _BUCKETS:
+        quota = DEMO_KEY_HOURLY_QUOTA if api_key == "DEMO_KEY" else API_KEY_HOURLY_QUOTA
+        _BUCKETS[api_key] = _TokenBucket(rate=quota / 3600, capacity=quota)
+    return _BUCKETS[api_key]
+
+
+def _backoff_delay(retry_wait: float, attempt: int, retry_after: Optional[float] = None) -> float:
+    delay = min(MAX_BACKOFF_SECONDS, retry_wait * 2**attempt) + random.uniform(0, 0.5)
+    if retry_after is not None:
+        # the server's Retry-After is a hard minimum
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
 
 
 def parse_date(value: str) -> dt.date:
     try:
-        return dt.datetime.strptime(value, "%Y-%m-%d").date()
+        parsed = dt.date.fromisoformat(value)
     except ValueError as exc:
         raise argparse.ArgumentTypeError(f"Invalid date '{value}', expected YYYY-MM-DD") from exc
+    # fromisoformat also takes other ISO forms (e.g. 20240101); only accept the dashed one
+    if parsed.isoformat() != value:
+        raise argparse.ArgumentTypeError(f"Invalid date '{value}', expected YYYY-MM-DD")
+    return parsed
 
 
 def resolve_date_range(days: int, start: Optional[dt.date], end: Optional[dt.date]) -> Tuple[dt.date, dt.date]:
@@ -56,8 +149,7 @@ def resolve_date_range(days: int, start: Optional[dt.date], end: Optional[dt.dat
         end = today
         start = today - dt.timedelta(days=days - 1)
 
-    if end > today:
-        end = today
+    end = min(end, today)
     if start > end:
         raise argparse.ArgumentTypeError("start date must be on or before end date")
     return start, end
@@ -70,7 +162,7 @@ def fetch_apod_range(
     thumbs: bool = True,
     retries: int = 3,
     retry_wait: int = 5,
-) -> List[Dict[str, Any]]:
+) -> List[ApodRow]:
     params = {
         "api_key": api_key,
         "start_date": start_date.isoformat(),
@@ -80,34 +172,26 @@ def fetch_apod_range(
         params["thumbs"] = "true"
 
     payload: Any = None
-    last_error: Optional[BaseException] = None
 
+    bucket = _bucket_for(api_key)
     for attempt in range(retries + 1):
+        bucket.acquire()
         try:
-            response = requests.get(API_URL, params=params, timeout=30)
-        except requests.RequestException as exc:  # network issue
-            last_error = exc
-            logger.warning("Request failed (attempt %s/%s): %s", attempt + 1, retries + 1, exc)
-            if attempt == retries:
-                raise
-            time.sleep(retry_wait)
-            continue
+            response = _SESSION.get(API_URL, params=params, timeout=30)
+        except requests.RequestException as exc:  # network issue, already retried by the session adapter
+            logger.warning("Request failed after adapter retries: %s", exc)
+            raise
 
         if response.status_code == 429 and attempt < retries:
-            wait_seconds = int(response.headers.get("Retry-After", retry_wait))
-            logger.warning("Rate limited by NASA API, retrying in %s seconds", wait_seconds)
-            time.sleep(wait_seconds)
-            continue
-
-        if response.status_code >= 500 and attempt < retries:
+            retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+            wait_seconds = _backoff_delay(retry_wait, attempt, retry_after)
             logger.warning(
-                "NASA API returned %s (attempt %s/%s), retrying in %s seconds",
-                response.status_code,
+                "Rate limited by NASA API (attempt %s/%s), retrying in %.1f seconds",
                 attempt + 1,
                 retries + 1,
-                retry_wait,
+                wait_seconds,
             )
-            time.sleep(retry_wait)
+            time.sleep(wait_seconds)
             continue
 
         try:
@@ -121,86 +205,169 @@ def fetch_apod_range(
             raise RuntimeError(f"NASA API returned {response.status_code}: {message}")
         break
     else:
-        raise RuntimeError(f"Failed to fetch NASA APOD after {retries + 1} attempts: {last_error}")
+        raise RuntimeError(f"Failed to fetch NASA APOD after {retries + 1} attempts")
 
     entries = payload if isinstance(payload, list) else [payload]
-    normalized: List[Dict[str, Any]] = []
+    normalized: List[ApodRow] = []
     for entry in entries:
-        date_value = entry.get("date")
-        title = entry.get("title")
+        get = entry.get
+        date_value = get("date")
+        title = get("title")
         if not date_value or not title:
             logger.debug("Skipping entry missing date or title: %s", entry)
             continue
+        # positional, in APOD_COLUMNS order, so rows bind straight into the upsert
         normalized.append(
-            {
-                "date": date_value,
-                "title": title,
-                "explanation": entry.get("explanation"),
-                "media_type": entry.get("media_type"),
-                "url": entry.get("url"),
-                "hdurl": entry.get("hdurl"),
-                "thumbnail_url": entry.get("thumbnail_url"),
-                "service_version": entry.get("service_version"),
-                "copyright": entry.get("copyright"),
-            }
+            (
+                date_value,
+                title,
+                get("explanation"),
+                get("media_type"),
+                get("url"),
+                get("hdurl"),
+                get("thumbnail_url"),
+                get("service_version"),
+                get("copyright"),
+            )
         )
     return normalized
 
 
-def ensure_schema(connection: sqlite3.Connection) -> None:
-    connection.execute(
+def _apply_write_pragmas(connection: sqlite3.Connection) -> None:
+    # WAL + synchronous=NORMAL means one fsync at COMMIT instead of one per statement.
+    # journal_mode has to be set outside of a transaction.
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute("PRAGMA temp_store=MEMORY")
+    connection.execute("PRAGMA cache_size=-20000")
+
+
+def _as_row(entry: ApodRow | Dict[str, Any]) -> ApodRow:
+    # dicts (e.g. hand-built entries) are still accepted and mapped onto the column order
+    if isinstance(entry, tuple):
+        return entry
+    return tuple(entry.get(col) for col in APOD_COLUMNS)
+
+
+def _chunked(entries: Iterable[Any], n: int = UPSERT_CHUNK_ROWS) -> Iterator[List[Any]]:
+    # consumes the iterable once, holding at most n rows at a time
+    it = iter(entries)
+    while True:
+        chunk = list(itertools.islice(it, n))
+        if not chunk:
+            return
+        yield chunk
+
+
+@lru_cache(maxsize=8)
+def _build_upsert_sql(nrows: int) -> str:
+    # chunks are always UPSERT_CHUNK_ROWS plus one remainder, so only a couple of shapes ever
+    # show up: the string is built once per shape, and on a connection sqlite3's statement
+    # cache (cached_statements) reuses the prepared program for every full chunk
+    row_placeholder = "(" + ",".join(["?"] * len(UPSERT_COLUMNS)) + ")"
+    updates = ",\n            ".join(f"{col}=excluded.{col}" for col in UPSERT_COLUMNS if col != "date")
+    return f"""
+        INSERT INTO apod_entries ({", ".join(UPSERT_COLUMNS)})
+        VALUES {",".join([row_placeholder] * nrows)}
+        ON CONFLICT(date) DO UPDATE SET
+            {updates},
+            fetched_at=CURRENT_TIMESTAMP;
         """
-        CREATE TABLE IF NOT EXISTS apod_entries (
-            date TEXT PRIMARY KEY,
-            title TEXT NOT NULL,
-            explanation TEXT,
-            media_type TEXT,
-            url TEXT,
-            hdurl TEXT,
-            thumbnail_url TEXT,
-            service_version TEXT,
-            copyright TEXT,
-            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-        """
-    )
-    connection.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_apod_media_type ON apod_entries (media_type);
-        """
-    )
 
 
-def persist_entries(db_path: str, entries: Iterable[Dict[str, Any]]) -> int:
-    entries = list(entries)
-    if not entries:
+def _chunk_scores(connection: sqlite3.Connection, rows: List[ApodRow], score: BatchScorer) -> List[float]:
+    """Sentiment per row, reusing the stored score when the explanation hasn't changed.
+
+    Re-fetching a date range mostly returns entries we already have, so only new or edited
+    explanations go through VADER.
+    """
+    placeholders = ",".join(["?"] * len(rows))
+    stored = {
+        date: (explanation, sentiment)
+        for date, explanation, sentiment in connection.execute(
+            f"SELECT date, explanation, sentiment_compound FROM apod_entries WHERE date IN ({placeholders})",
+            [row[0] for row in rows],
+        )
+    }
+    scores: List[Optional[float]] = []
+    to_score: List[int] = []
+    for i, row in enumerate(rows):
+        explanation, sentiment = stored.get(row[0], (None, None))
+        if sentiment is not None and explanation == row[EXPLANATION_IDX]:
+            scores.append(sentiment)
+        else:
+            scores.append(None)
+            to_score.append(i)
+    for i, value in zip(to_score, score(rows[i][EXPLANATION_IDX] for i in to_score)):
+        scores[i] = value
+    return scores
+
+
+def persist_entries(db_path: str, entries: Iterable[ApodRow | Dict[str, Any]], bulk: bool = False) -> int:
+    # generators are streamed chunk by chunk; only sized inputs can switch to bulk mode on their own
+    bulk = bulk or (isinstance(entries, Sized) and len(entries) > BULK_THRESHOLD)
+    chunks = _chunked(entries)
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
         return 0
 
-    with sqlite3.connect(db_path) as connection:
-        ensure_schema(connection)
-        connection.executemany(
-            """
-            INSERT INTO apod_entries (
-                date, title, explanation, media_type, url, hdurl, thumbnail_url, service_version, copyright
-            )
-            VALUES (
-                :date, :title, :explanation, :media_type, :url, :hdurl, :thumbnail_url, :service_version, :copyright
+    # isolation_level=None turns off sqlite3's implicit BEGIN, so the explicit
+    # BEGIN IMMEDIATE / COMMIT below is the only transaction for the whole batch.
+    connection = sqlite3.connect(db_path, isolation_level=None, cached_statements=256)
+    score = BatchScorer()
+    try:
+        _apply_write_pragmas(connection)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            ensure_schema(connection)
+            if bulk:
+                drop_indexes(connection)
+            # one multi-row INSERT per chunk instead of one statement step per row
+            total = 0
+            for chunk in itertools.chain([first_chunk], chunks):
+                rows = [_as_row(entry) for entry in chunk]
+                scores = _chunk_scores(connection, rows, score)
+                values = list(itertools.chain.from_iterable(row + (sentiment,) for row, sentiment in zip(rows, scores)))
+                connection.execute(_build_upsert_sql(len(chunk)), values)
+                total += len(chunk)
+            if bulk:
+                # rebuilt before COMMIT so readers never see the table without its index
+                create_indexes(connection)
+            bump_generation(connection)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+    finally:
+        score.close()
+        connection.close()
+    return total
+
+
+def backfill_sentiment(db_path: str) -> int:
+    """Score rows stored before sentiment was computed at ingest. Returns the number updated."""
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            ensure_schema(connection)
+            rows = connection.execute(
+                "SELECT date, explanation FROM apod_entries WHERE sentiment_compound IS NULL"
+            ).fetchall()
+            scores = compound_many(explanation for _, explanation in rows)
+            connection.executemany(
+                "UPDATE apod_entries SET sentiment_compound=? WHERE date=?",
+                [(score, date) for (date, _), score in zip(rows, scores)],
             )
-            ON CONFLICT(date) DO UPDATE SET
-                title=excluded.title,
-                explanation=excluded.explanation,
-                media_type=excluded.media_type,
-                url=excluded.url,
-                hdurl=excluded.hdurl,
-                thumbnail_url=excluded.thumbnail_url,
-                service_version=excluded.service_version,
-                copyright=excluded.copyright,
-                fetched_at=CURRENT_TIMESTAMP;
-            """,
-            entries,
-        )
-        connection.commit()
-    return len(entries)
+            if rows:
+                bump_generation(connection)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+    finally:
+        connection.close()
+    return len(rows)
 
 
 def main() -> None:
@@ -233,10 +400,25 @@ def main() -> None:
         default=DEFAULT_API_KEY,
         help="NASA API key. Defaults to env var NASA_API_KEY (falls back to DEMO_KEY if not set).",
     )
-    parser.add_argument("--max-retries", type=int, default=3, help="Retry attempts on transient failures.")
-    parser.add_argument("--retry-wait", type=int, default=5, help="Seconds to wait between retries.")
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="Retry attempts when rate limited (429). Network errors and 5xx are retried by the HTTP session.",
+    )
+    parser.add_argument("--retry-wait", type=int, default=5, help="Base seconds for the 429 exponential backoff.")
+    parser.add_argument(
+        "--backfill-sentiment",
+        action="store_true",
+        help="Only compute sentiment_compound for stored rows that lack it, then exit (no API calls).",
+    )
     args = parser.parse_args()
 
+    if args.backfill_sentiment:
+        updated = backfill_sentiment(args.database)
+        logger.info("Backfilled sentiment for %s rows in %s", updated, args.database)
+        return
+
     start_date, end_date = resolve_date_range(args.days, args.start_date, args.end_date)
     logger.info("Fetching APOD entries from %s to %s", start_date, end_date)
 
@@ -0,0 +1,26 @@
+"""JSON helpers that use orjson when it is installed.
+
+orjson (Rust) parses and encodes noticeably faster than the stdlib `json`, which matters for
+big Mars photo lists. If it's missing, the stdlib is used and the output looks the same:
+2-space indent, UTF-8 text.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except Exception:  # orjson not installed
+    orjson = None
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_pretty(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(obj, indent=2, ensure_ascii=False)
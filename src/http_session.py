@@ -0,0 +1,38 @@
+"""Shared HTTP session for the NASA API scripts.
+
+my notes:
+- `requests.get` opens a brand new TCP + TLS connection every call. A `requests.Session` keeps the
+  connection to api.nasa.gov alive, so retries and back-to-back calls skip the handshake.
+- The mounted adapter also retries connection errors and 5xx responses with exponential backoff.
+  429 (rate limit) is left to the callers so they can log it and honor their own pacing.
+  Keeping it out of `status_forcelist` isn't enough: urllib3 also retries 413/429/503 whenever
+  the response has a Retry-After header, hence `_Retry` below.
+"""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class _Retry(Retry):
+    # class attribute on purpose: Retry.new() builds each follow-up Retry from __init__ args,
+    # so an instance override would be gone after the first retry
+    RETRY_AFTER_STATUS_CODES = frozenset({503})
+
+
+def build_session(retries: int = 3, pool_maxsize: int = 16) -> requests.Session:
+    retry = _Retry(
+        total=retries,
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=1,
+        respect_retry_after_header=True,
+        # hand the last 5xx response back instead of raising, so callers can report it
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -6,53 +6,67 @@ file to the data folder.
 
 so what i did here is if the API returns 404 for a date/sol (no photos), the code returns an empty list instead of crashing. 
 took long to fix this bug 
+
+For many dates/sols at once, `fetch_mars_photos_many` runs the requests concurrently with aiohttp
+(optional dependency) over one pooled session, capped by a semaphore so we don't hammer the API.
 """
 
 import argparse
+import asyncio
 import datetime as dt
-import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional
 
 import requests
 
+try:
+    import aiohttp
+except Exception:  # aiohttp not installed; only the concurrent fetcher needs it
+    aiohttp = None
+
 try:
     from src.config import get_env
+    from src.fast_json import dumps_pretty, loads
+    from src.http_session import build_session
 except ModuleNotFoundError:
     project_root = Path(__file__).resolve().parents[1]
     if str(project_root) not in sys.path:
         sys.path.insert(0, str(project_root))
     from src.config import get_env
+    from src.fast_json import dumps_pretty, loads
+    from src.http_session import build_session
 
 DEFAULT_API_KEY = get_env("NASA_API_KEY", "DEMO_KEY")
 DEFAULT_ROVER = "curiosity"
+DEFAULT_CONCURRENCY = 8
+_SESSION = build_session()
 
 
-def fetch_mars_photos(
-    api_key: str,
-    rover: str,
-    earth_date: dt.date | None = None,
-    sol: int | None = None,
-) -> List[Dict[str, Any]]:
-    base_url = f"https://api.nasa.gov/mars-photos/api/v1/rovers/{rover}/photos"
+def _positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Invalid number '{value}'") from exc
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"Must be at least 1, got {number}")
+    return number
+
+
+def _photos_url(rover: str) -> str:
+    return f"https://api.nasa.gov/mars-photos/api/v1/rovers/{rover}/photos"
+
+
+def _build_params(api_key: str, earth_date: dt.date | None = None, sol: int | None = None) -> Dict[str, Any]:
     params: Dict[str, Any] = {"api_key": api_key}
     if earth_date:
         params["earth_date"] = earth_date.isoformat()
     if sol is not None:
         params["sol"] = sol
+    return params
 
-    try:
-        resp = requests.get(base_url, params=params, timeout=30)
-        if resp.status_code == 404:
-            # No photos for that date/sol or rover; return empty instead of raising
-            return []
-        resp.raise_for_status()
-    except requests.HTTPError as exc:
-        snippet = resp.text[:200] if "resp" in locals() else str(exc)
-        raise RuntimeError(f"NASA Mars API error {getattr(resp, 'status_code', '?')}: {snippet}") from exc
 
-    data = resp.json().get("photos", [])
+def _normalize_photos(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return [
         {
             "id": item.get("id"),
@@ -66,29 +80,125 @@ def fetch_mars_photos(
     ]
 
 
+def fetch_mars_photos(
+    api_key: str,
+    rover: str,
+    earth_date: dt.date | None = None,
+    sol: int | None = None,
+) -> List[Dict[str, Any]]:
+    base_url = _photos_url(rover)
+    params = _build_params(api_key, earth_date=earth_date, sol=sol)
+
+    try:
+        resp = _SESSION.get(base_url, params=params, timeout=30)
+        if resp.status_code == 404:
+            # No photos for that date/sol or rover; return empty instead of raising
+            return []
+        resp.raise_for_status()
+    except requests.HTTPError as exc:
+        snippet = resp.text[:200] if "resp" in locals() else str(exc)
+        raise RuntimeError(f"NASA Mars API error {getattr(resp, 'status_code', '?')}: {snippet}") from exc
+
+    data = loads(resp.content).get("photos", [])
+    return _normalize_photos(data)
+
+
+async def _fetch_one(
+    session: "aiohttp.ClientSession",
+    url: str,
+    params: Dict[str, Any],
+    sem: asyncio.Semaphore,
+) -> List[Dict[str, Any]]:
+    async with sem:
+        async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=30)) as resp:
+            if resp.status == 404:
+                return []
+            if resp.status >= 400:
+                snippet = (await resp.text())[:200]
+                raise RuntimeError(f"NASA Mars API error {resp.status}: {snippet}")
+            payload = loads(await resp.read())
+    return _normalize_photos(payload.get("photos", []))
+
+
+async def _fetch_many(
+    api_key: str,
+    rover: str,
+    earth_dates: Iterable[dt.date],
+    sols: Iterable[int],
+    concurrency: int,
+) -> List[Dict[str, Any]]:
+    url = _photos_url(rover)
+    param_sets = [_build_params(api_key, earth_date=d) for d in earth_dates]
+    param_sets += [_build_params(api_key, sol=s) for s in sols]
+
+    sem = asyncio.Semaphore(concurrency)
+    # one session/connector for all requests so DNS + TLS handshakes are pooled; one pooled
+    # connection per allowed in-flight request, so the pool never caps --concurrency
+    connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        results = await asyncio.gather(*[_fetch_one(session, url, params, sem) for params in param_sets])
+    return [photo for photos in results for photo in photos]
+
+
+def fetch_mars_photos_many(
+    api_key: str,
+    rover: str,
+    earth_dates: Optional[Iterable[dt.date]] = None,
+    sols: Optional[Iterable[int]] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> List[Dict[str, Any]]:
+    """Fetch photos for many Earth dates and/or sols concurrently (sync wrapper around asyncio)."""
+    if concurrency < 1:
+        # Semaphore(0) would never let a request start
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+    if aiohttp is None:
+        raise RuntimeError("aiohttp is required for concurrent fetching: python -m pip install aiohttp")
+    return asyncio.run(_fetch_many(api_key, rover, earth_dates or [], sols or [], concurrency))
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Fetch Mars rover photos for a given Earth date or sol and save JSON.")
-    parser.add_argument("--date", help="Earth date YYYY-MM-DD (optional if --sol is provided)")
-    parser.add_argument("--sol", type=int, help="Martian sol (mission day).")
+    parser.add_argument(
+        "--date",
+        nargs="+",
+        help="Earth date(s) YYYY-MM-DD (optional if --sol is provided). Several values are fetched concurrently.",
+    )
+    parser.add_argument("--sol", type=int, nargs="+", help="Martian sol(s) (mission day).")
     parser.add_argument("--rover", default=DEFAULT_ROVER, help="Rover name: curiosity|opportunity|spirit|perseverance")
     parser.add_argument("--api-key", default=DEFAULT_API_KEY, help="NASA API key")
     parser.add_argument("--output", default="data/mars_photos.json", help="Output JSON path")
+    parser.add_argument(
+        "--concurrency",
+        type=_positive_int,
+        default=DEFAULT_CONCURRENCY,
+        help="Max in-flight requests when several dates/sols are given.",
+    )
     args = parser.parse_args()
 
     if not args.date and args.sol is None:
-        args.date = dt.date.today().isoformat()
-
-    earth_date = dt.datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
-    photos = fetch_mars_photos(
-        api_key=args.api_key,
-        rover=args.rover,
-        earth_date=earth_date,
-        sol=args.sol,
-    )
+        args.date = [dt.date.today().isoformat()]
+
+    earth_dates = [dt.datetime.strptime(d, "%Y-%m-%d").date() for d in args.date or []]
+    sols = args.sol or []
+    if len(earth_dates) > 1 or len(sols) > 1:
+        photos = fetch_mars_photos_many(
+            api_key=args.api_key,
+            rover=args.rover,
+            earth_dates=earth_dates,
+            sols=sols,
+            concurrency=args.concurrency,
+        )
+    else:
+        photos = fetch_mars_photos(
+            api_key=args.api_key,
+            rover=args.rover,
+            earth_date=earth_dates[0] if earth_dates else None,
+            sol=sols[0] if sols else None,
+        )
 
     out_path = Path(args.output)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(json.dumps(photos, indent=2), encoding="utf-8")
+    out_path.write_text(dumps_pretty(photos), encoding="utf-8")
     print(f"Saved {len(photos)} photos to {out_path} (rover={args.rover}, date={args.date}, sol={args.sol})")
 
 
@@ -1,23 +1,35 @@
 """NLP analysis
 
-what i did here is the code reads date, title, and explanation from the apod_entries table and
+what i did here is the code reads the explanation text from the apod_entries table and
 produces two small JSON files in the data folder
 - `data/nlp_entities.json`: most common detected "entities"
 - `data/nlp_keyphrases.json`: most common keyphrase-style terms
 
-If spaCy is available, the script uses spaCy's NER and noun chunks.
+If spaCy is available, the script uses spaCy's NER and noun chunks. With `--phrase-method pos` the
+keyphrases come from POS-tag spans (adjectives + nouns) instead, which skips the dependency parser,
+the most expensive pipe in the small English model.
 If spaCy cannot be imported or the model cannot be loaded, the script falls back to
 simple regex heuristics so the project still runs in a limited environment.
 """
 
 import argparse
-import json
+import os
 import re
+import sqlite3
+import sys
 from collections import Counter
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
-import pandas as pd
+try:
+    from src.fast_json import dumps_pretty
+except ModuleNotFoundError:
+    # Support running as a script: `python src/nlp_analysis.py ...`
+    project_root = Path(__file__).resolve().parents[1]
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+    from src.fast_json import dumps_pretty
 
 try:
     import spacy
@@ -26,64 +38,94 @@ except Exception:  # spaCy not available or incompatible with Python version
 
 ROOT = Path(__file__).resolve().parent.parent
 DB_PATH = ROOT / "data" / "apod.db"
+# fallback heuristics, compiled once instead of per document
+_CAP_RE = re.compile(r"\b[A-Z][A-Za-z]{3,}\b")
+_PHRASE_RE = re.compile(r"\b([a-z]{4,}(?:\s+[a-z]{4,}){0,2})\b")
+BATCH_SIZE = 256
+DEFAULT_N_PROCESS = max(1, (os.cpu_count() or 1) - 1)
+# neither task reads lemmas or text categories, so never deserialize those pipes
+EXCLUDED_PIPES = ("lemmatizer", "textcat")
 DEFAULT_ENTITIES = ["PERSON", "NORP", "FAC", "ORG", "GPE", "LOC", "PRODUCT", "EVENT", "WORK_OF_ART", "LAW", "LANGUAGE"]
 
 
-def load_nlp(model: str):
+@lru_cache(maxsize=4)
+def load_nlp(model: str, exclude: Tuple[str, ...] = EXCLUDED_PIPES):
     if spacy is None:
         return None
     try:
-        return spacy.load(model)
+        return spacy.load(model, exclude=list(exclude))
     except Exception:
         return None
 
 
-def load_data(db_path: Path) -> pd.DataFrame:
-    import sqlite3
-
+def load_texts(db_path: Path) -> List[str]:
+    # plain cursor rows: only the explanation strings are needed, no DataFrame
     with sqlite3.connect(db_path) as con:
-        df = pd.read_sql_query("SELECT date, title, explanation FROM apod_entries", con)
-    df["explanation"] = df["explanation"].fillna("")
-    return df
+        rows = con.execute("SELECT explanation FROM apod_entries").fetchall()
+    return [row[0] or "" for row in rows]
+
 
+def _pipe(nlp, texts: List[str], disable: List[str], n_process: int):
+    # worker processes only pay off once there is more than one batch to hand out
+    if len(texts) <= BATCH_SIZE:
+        n_process = 1
+    return nlp.pipe(texts, batch_size=BATCH_SIZE, n_process=n_process, disable=disable)
 
-def extract_entities(texts: List[str], nlp, labels: List[str]) -> Counter:
+
+def extract_entities(texts: List[str], nlp, labels: List[str], n_process: int = 1) -> Counter:
     if nlp is None:
         # Fallback: simple capitalized-token heuristic as pseudo-entities
         counts: Counter = Counter()
         for text in texts:
-            for token in re.findall(r"\b[A-Z][A-Za-z]{3,}\b", text):
-                counts[token] += 1
+            counts.update(_CAP_RE.findall(text))
         return counts
     counts: Counter = Counter()
-    for doc in nlp.pipe(texts, batch_size=32, disable=["tagger", "lemmatizer", "textcat"]):
-        for ent in doc.ents:
-            if ent.label_ in labels:
-                counts[ent.text] += 1
+    for doc in _pipe(nlp, texts, ["tagger", "lemmatizer", "textcat"], n_process):
+        counts.update(ent.text for ent in doc.ents if ent.label_ in labels)
     return counts
 
 
-def extract_keyphrases(texts: List[str], nlp) -> Counter:
+# shallow noun phrase: any adjectives/nouns ending in at least one noun
+_NOUN_PHRASE_PATTERN = [
+    {"POS": {"IN": ["ADJ", "NOUN", "PROPN"]}, "OP": "*"},
+    {"POS": {"IN": ["NOUN", "PROPN"]}, "OP": "+"},
+]
+
+
+@lru_cache(maxsize=4)
+def _noun_phrase_matcher(nlp):
+    from spacy.matcher import Matcher
+
+    matcher = Matcher(nlp.vocab)
+    matcher.add("NOUN_PHRASE", [_NOUN_PHRASE_PATTERN], greedy="LONGEST")
+    return matcher
+
+
+def extract_keyphrases(texts: List[str], nlp, n_process: int = 1, method: str = "noun_chunks") -> Counter:
     if nlp is None:
         counts: Counter = Counter()
         for text in texts:
             # simple 1-3 word lowercase phrases of 4+ letters
-            for phrase in re.findall(r"\b([a-z]{4,}(?:\s+[a-z]{4,}){0,2})\b", text.lower()):
-                counts[phrase.strip()] += 1
+            counts.update(_PHRASE_RE.findall(text.lower()))
         return counts
     counts: Counter = Counter()
-    for doc in nlp.pipe(texts, batch_size=32, disable=["ner", "textcat"]):
-        for chunk in doc.noun_chunks:
-            phrase = chunk.text.strip().lower()
-            if len(phrase) >= 4:
-                counts[phrase] += 1
+    if method == "pos":
+        # tagger + attribute_ruler are enough for POS spans; the parser never runs
+        matcher = _noun_phrase_matcher(nlp)
+        for doc in _pipe(nlp, texts, ["ner", "parser", "textcat"], n_process):
+            phrases = (span.text.strip().lower() for span in matcher(doc, as_spans=True))
+            counts.update(phrase for phrase in phrases if len(phrase) >= 4)
+        return counts
+    for doc in _pipe(nlp, texts, ["ner", "textcat"], n_process):
+        phrases = (chunk.text.strip().lower() for chunk in doc.noun_chunks)
+        counts.update(phrase for phrase in phrases if len(phrase) >= 4)
     return counts
 
 
 def save_top(counter: Counter, top_n: int, path: Path, label: str) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     data = [{"text": text, "count": count} for text, count in counter.most_common(top_n)]
-    path.write_text(json.dumps({label: data}, indent=2), encoding="utf-8")
+    path.write_text(dumps_pretty({label: data}), encoding="utf-8")
 
 
 def main():
@@ -93,16 +135,27 @@ def main():
     parser.add_argument("--database", default=str(DB_PATH), help="Path to SQLite database")
     parser.add_argument("--model", default="en_core_web_sm", help="spaCy model name")
     parser.add_argument("--top", type=int, default=25, help="Top N items to keep")
+    parser.add_argument(
+        "--phrase-method",
+        choices=["noun_chunks", "pos"],
+        default="noun_chunks",
+        help="spaCy keyphrases from parser noun chunks, or faster POS-tag spans without the parser",
+    )
+    parser.add_argument(
+        "--n-process",
+        type=int,
+        default=DEFAULT_N_PROCESS,
+        help="spaCy worker processes for nlp.pipe (default: CPU count - 1)",
+    )
     parser.add_argument("--entities-out", default=str(ROOT / "data" / "nlp_entities.json"), help="Entities JSON output")
     parser.add_argument("--phrases-out", default=str(ROOT / "data" / "nlp_keyphrases.json"), help="Keyphrases JSON output")
     args = parser.parse_args()
 
     nlp = load_nlp(args.model)
-    df = load_data(Path(args.database))
-    texts = df["explanation"].tolist()
+    texts = load_texts(Path(args.database))
 
-    ent_counts = extract_entities(texts, nlp, DEFAULT_ENTITIES)
-    phrase_counts = extract_keyphrases(texts, nlp)
+    ent_counts = extract_entities(texts, nlp, DEFAULT_ENTITIES, n_process=args.n_process)
+    phrase_counts = extract_keyphrases(texts, nlp, n_process=args.n_process, method=args.phrase_method)
 
     save_top(ent_counts, args.top, Path(args.entities_out), label="entities")
     save_top(phrase_counts, args.top, Path(args.phrases_out), label="keyphrases")
@@ -0,0 +1,128 @@
+"""apod_entries table definition, shared by the pipeline (writer) and the web UI (reader).
+
+my notes:
+- `ensure_schema` is safe to call on every connection: it creates what's missing and
+  upgrades databases made by older versions of the pipeline in place.
+- every write to apod_entries bumps `PRAGMA user_version` (`bump_generation`); the web UI
+  reads it back as a cheap "has anything changed" fingerprint instead of scanning the table.
+- `explanation_snippet` / `explanation_len` are generated columns (SQLite 3.31+), so the
+  web UI's 240-char preview is computed once at write time instead of on every page load.
+  SQLite can't ALTER TABLE ADD a STORED generated column, so a table from before those
+  columns existed (or one that got VIRTUAL ones from an earlier version of this module)
+  is rebuilt once: new table, INSERT ... SELECT, drop the old one, rename, all in one
+  savepoint so a failed upgrade leaves the old table untouched.
+"""
+
+import sqlite3
+from typing import Dict
+
+SNIPPET_CHARS = 240
+
+_TABLE_SQL = """
+CREATE TABLE {if_not_exists}{name} (
+    date TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    explanation TEXT,
+    media_type TEXT,
+    url TEXT,
+    hdurl TEXT,
+    thumbnail_url TEXT,
+    service_version TEXT,
+    copyright TEXT,
+    fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sentiment_compound REAL,
+    explanation_snippet TEXT GENERATED ALWAYS AS (substr(explanation, 1, {snippet_chars})) STORED,
+    explanation_len INTEGER GENERATED ALWAYS AS (length(explanation)) STORED
+);
+"""
+CREATE_TABLE_SQL = _TABLE_SQL.format(if_not_exists="IF NOT EXISTS ", name="apod_entries", snippet_chars=SNIPPET_CHARS)
+
+# columns added after the first release, as ALTER TABLE ADD COLUMN definitions
+ADDED_COLUMNS = {
+    "sentiment_compound": "REAL",
+}
+
+# must be STORED generated columns; anything else means the table needs a rebuild
+STORED_COLUMNS = ("explanation_snippet", "explanation_len")
+
+# PRAGMA table_xinfo's "hidden" field: 0 = ordinary column, 3 = STORED generated column
+_ORDINARY, _STORED = 0, 3
+
+# date already has the PRIMARY KEY's index; (media_type, date DESC) serves the web UI's
+# "media = ? ORDER BY date DESC LIMIT n" query straight from the index, already in order
+# no covering index for that page on purpose: it reads explanation_snippet/explanation_len,
+# and SQLite's planner never treats an index as covering once generated columns are read
+# (checked up to 3.51), so a (date DESC, title, snippet, ...) index would only cost writes
+SECONDARY_INDEXES = {
+    "idx_apod_media_date": "CREATE INDEX IF NOT EXISTS idx_apod_media_date ON apod_entries (media_type, date DESC);",
+}
+
+
+# superseded indexes still present in older databases: (media_type) alone is a prefix of
+# idx_apod_media_date, so it only added upkeep to every upsert
+OBSOLETE_INDEXES = ("idx_apod_media_type",)
+
+
+def create_indexes(connection: sqlite3.Connection) -> None:
+    for ddl in SECONDARY_INDEXES.values():
+        connection.execute(ddl)
+
+
+def drop_indexes(connection: sqlite3.Connection) -> None:
+    for name in SECONDARY_INDEXES:
+        connection.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def data_generation(connection: sqlite3.Connection) -> int:
+    """Counter the writers bump on every change to apod_entries (kept in PRAGMA user_version)."""
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def bump_generation(connection: sqlite3.Connection) -> None:
+    # call inside the write transaction, so the bump commits (or rolls back) with the rows
+    connection.execute(f"PRAGMA user_version = {data_generation(connection) + 1}")
+
+
+def _rebuild_table(connection: sqlite3.Connection, existing: Dict[str, int]) -> None:
+    """Recreate apod_entries with the current layout, keeping every ordinary column we still have."""
+    connection.execute("SAVEPOINT rebuild_apod")
+    try:
+        connection.execute("DROP TABLE IF EXISTS apod_entries_new")
+        connection.execute(_TABLE_SQL.format(if_not_exists="", name="apod_entries_new", snippet_chars=SNIPPET_CHARS))
+        new_columns = [
+            row[1] for row in connection.execute("PRAGMA table_xinfo(apod_entries_new)") if row[6] == _ORDINARY
+        ]
+        keep = ", ".join(name for name in new_columns if existing.get(name) == _ORDINARY)
+        connection.execute(f"INSERT INTO apod_entries_new ({keep}) SELECT {keep} FROM apod_entries")
+        connection.execute("DROP TABLE apod_entries")
+        connection.execute("ALTER TABLE apod_entries_new RENAME TO apod_entries")
+    except BaseException:
+        connection.execute("ROLLBACK TO rebuild_apod")
+        connection.execute("RELEASE rebuild_apod")
+        raise
+    connection.execute("RELEASE rebuild_apod")
+
+
+def ensure_schema(connection: sqlite3.Connection) -> bool:
+    """Create/upgrade apod_entries and its indexes. Returns True if anything had to change."""
+    names = {row[0] for row in connection.execute("SELECT name FROM sqlite_master")}
+    changed = "apod_entries" not in names or not set(SECONDARY_INDEXES) <= names
+    for name in OBSOLETE_INDEXES:
+        if name in names:
+            connection.execute(f"DROP INDEX {name}")
+            changed = True
+
+    connection.execute(CREATE_TABLE_SQL)
+    # table_xinfo (unlike table_info) also lists generated columns, and how they're generated
+    existing = {row[1]: row[6] for row in connection.execute("PRAGMA table_xinfo(apod_entries)")}
+    if any(existing.get(name) != _STORED for name in STORED_COLUMNS):
+        # also picks up any ADDED_COLUMNS the old table was missing; its indexes go with it
+        _rebuild_table(connection, existing)
+        changed = True
+    else:
+        for name, definition in ADDED_COLUMNS.items():
+            if name not in existing:
+                connection.execute(f"ALTER TABLE apod_entries ADD COLUMN {name} {definition}")
+                changed = True
+    create_indexes(connection)
+    return changed
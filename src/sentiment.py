@@ -0,0 +1,88 @@
+"""VADER sentiment for APOD explanations.
+
+my notes:
+- An explanation never changes once it is published, so its score only needs computing once.
+  The pipeline scores entries at ingest time and stores the compound score in the
+  `sentiment_compound` column; the web UI just reads that column.
+- "compound" is VADER's overall score from -1 (very negative) to +1 (very positive).
+- VADER is pure Python and CPU-bound, and every text is scored independently, so big batches
+  (long backfills, multi-year fetches) are spread over a process pool. Small batches stay in
+  process because starting workers costs more than scoring a month of entries.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+# below this many texts (in total, per scorer) the pool isn't worth starting
+PARALLEL_MIN_TEXTS = 256
+POOL_CHUNKSIZE = 25
+
+_analyzer: Optional[SentimentIntensityAnalyzer] = None
+
+
+def _get_analyzer() -> SentimentIntensityAnalyzer:
+    # building the analyzer loads the ~7500-word lexicon, so do it once per process
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def _init_worker() -> None:
+    _get_analyzer()
+
+
+@lru_cache(maxsize=4096)
+def _cached_compound(text: str) -> float:
+    # texts are immutable, so a repeated explanation (re-fetched dates, backfill after ingest)
+    # is a dict lookup instead of another lexicon scan
+    return _get_analyzer().polarity_scores(text).get("compound", 0.0)
+
+
+def compound(text: Optional[str]) -> float:
+    # VADER always gives 0.0 for blank text; don't run the tokenizer for it (or cache it)
+    if not text or text.isspace():
+        return 0.0
+    return _cached_compound(text)
+
+
+class BatchScorer:
+    """Scores batches of texts; switches to a process pool once enough texts have gone through.
+
+    Use it as a context manager so the pool (if one was started) is shut down.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, parallel_min: int = PARALLEL_MIN_TEXTS) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.parallel_min = parallel_min
+        self.seen = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __call__(self, texts: Iterable[Optional[str]]) -> List[float]:
+        texts = list(texts)
+        self.seen += len(texts)
+        if self._pool is None and (self.max_workers < 2 or self.seen < self.parallel_min):
+            return [compound(text) for text in texts]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+        return list(self._pool.map(compound, texts, chunksize=POOL_CHUNKSIZE))
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self) -> "BatchScorer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def compound_many(texts: Iterable[Optional[str]], max_workers: Optional[int] = None) -> List[float]:
+    with BatchScorer(max_workers=max_workers) as score:
+        return score(texts)
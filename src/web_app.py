@@ -4,21 +4,83 @@ from __future__ import annotations
 
 what it does, it reads rows from data/apod.db, lets a reviewer(for example: me or you) filter
 by date range and media type, and shows a quick VADER sentiment score for each
-explanation.
+explanation. The score is computed once by the pipeline and stored in `sentiment_compound`
+(run `python src/apod_pipeline.py --backfill-sentiment` for an older database).
 """
 
+import datetime as dt
+import hashlib
 import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from itertools import product
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Iterable, Iterator, List, Tuple
 
-from flask import Flask, render_template_string, request
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from flask import Flask, abort, request, stream_with_context
+
+try:
+    from src.schema import SNIPPET_CHARS, data_generation, ensure_schema
+except ModuleNotFoundError:
+    # Support running as a script: `python src/web_app.py`
+    project_root = Path(__file__).resolve().parents[1]
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
+    from src.schema import SNIPPET_CHARS, data_generation, ensure_schema
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 DB_PATH = BASE_DIR / "data" / "apod.db"
 
 app = Flask(__name__)
-_sentiment = SentimentIntensityAnalyzer()
+# static files (src/static/) are cached by the browser for a year; the ?v= in the page's link
+# changes whenever style.css does, so an edit is still picked up right away
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 31536000
+STATIC_VERSION = str(int((Path(app.static_folder) / "style.css").stat().st_mtime))
+
+
+def ensure_read_schema(db_path: Path = DB_PATH) -> None:
+    """Upgrade an older database (indexes, generated snippet columns) before serving it.
+
+    This is the only place the UI writes, so it runs once at startup rather than at import:
+    from `__main__` below, and from gunicorn's `on_starting` hook (gunicorn.conf.py).
+    """
+    if not db_path.exists():
+        return
+    # BEGIN IMMEDIATE makes concurrent callers (the dev server's reloader, a second instance)
+    # take turns, so only the first one upgrades and the rest find nothing left to do
+    con = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            changed = ensure_schema(con)
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        con.execute("COMMIT")
+        if changed:
+            # refresh planner statistics once so the new index actually gets picked
+            con.execute("ANALYZE")
+    finally:
+        con.close()
+
+# one connection per worker thread, opened on first use and reused by every later request
+_local = threading.local()
+
+
+def _get_conn() -> sqlite3.Connection:
+    con = getattr(_local, "con", None)
+    if con is None:
+        # the UI never writes: read-only skips write-lock bookkeeping (the pipeline already
+        # puts the database in WAL mode, so these readers don't block its writes)
+        con = sqlite3.connect(f"{DB_PATH.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        con.row_factory = sqlite3.Row
+        # serve pages straight from the OS page cache via mmap, plus a 64 MB SQLite cache
+        con.execute("PRAGMA mmap_size=268435456")
+        con.execute("PRAGMA cache_size=-64000")
+        _local.con = con
+    return con
+
 
 PAGE = """
 <!doctype html>
@@ -26,21 +88,12 @@ PAGE = """
 <head>
   <meta charset="utf-8">
   <title>APOD Browser (Local)</title>
-  <style>
-    body { font-family: Arial, sans-serif; margin: 1.5rem; }
-    header { margin-bottom: 1rem; }
-    .card { border: 1px solid #ddd; border-radius: 8px; padding: 1rem; margin-bottom: 1rem; }
-    .meta { color: #555; font-size: 0.9rem; }
-    .title { font-weight: 600; }
-    .sent { font-size: 0.85rem; color: #333; }
-    form { margin-bottom: 1rem; }
-    input, select { padding: 0.35rem; }
-  </style>
+  <link rel="stylesheet" href="{{ url_for('static', filename='style.css', v=static_version) }}">
 </head>
 <body>
 <header>
   <h1>NASA APOD Browser (Local Database)</h1>
-  <p class="meta">This page reads from <code>data/apod.db</code> and shows up to the latest 100 matching entries.</p>
+  <p class="meta">This page reads from <code>data/apod.db</code> and shows the latest matching entries, {{ limit }} per page.</p>
   <form method="get">
     <label>Date range: <input type="date" name="start" value="{{ start }}"> to <input type="date" name="end" value="{{ end }}"></label>
     <label>Media: 
@@ -58,52 +111,196 @@ PAGE = """
   <div class="card">
     <div class="meta">{{ row['date'] }} • {{ row['media_type'] }}{% if row['copyright'] %} • © {{ row['copyright'] }}{% endif %}</div>
     <div class="title">{{ row['title'] }}</div>
-    <p>{{ row['explanation'][:240] }}{% if row['explanation'] and row['explanation']|length > 240 %}...{% endif %}</p>
+    <p>{{ row['explanation_snippet'] or '' }}{% if row['explanation_len'] and row['explanation_len'] > snippet_chars %}...{% endif %}</p>
     {% if row['url'] %}<div><a href="{{ row['url'] }}" target="_blank" rel="noreferrer">Open media</a></div>{% endif %}
-    <div class="sent">Sentiment (VADER, compound): {{ "%.3f"|format(row['sentiment']) }}</div>
+    <div class="sent">Sentiment (VADER, compound): {% if row['sentiment'] is not none %}{{ "%.3f"|format(row['sentiment']) }}{% else %}n/a{% endif %}</div>
   </div>
+  {% if loop.last and loop.index == limit %}
+  {# a full page means there may be more; the next one starts below the last date shown #}
+  <p class="pager"><a href="{{ url_for('index', start=start or none, end=end or none, media=media or none, after=row['date'], limit=limit) }}">Older &rarr;</a></p>
+  {% endif %}
+  {% else %}
+  <p>No entries found for the selected filters.</p>
   {% endfor %}
-  {% if not rows %}<p>No entries found for the selected filters.</p>{% endif %}
 </section>
 </body>
 </html>
 """
 
 
-def fetch_rows(start: str | None, end: str | None, media: str | None) -> List[Dict[str, Any]]:
-    query = "SELECT * FROM apod_entries WHERE 1=1"
-    params: List[Any] = []
-    if start:
-        query += " AND date >= ?"
-        params.append(start)
-    if end:
-        query += " AND date <= ?"
-        params.append(end)
-    if media:
-        query += " AND media_type = ?"
-        params.append(media)
-    query += " ORDER BY date DESC LIMIT 100"
-
-    with sqlite3.connect(DB_PATH) as con:
-        con.row_factory = sqlite3.Row
-        rows = con.execute(query, params).fetchall()
-    results: List[Dict[str, Any]] = []
+# browsers may reuse a page this long before revalidating with If-None-Match
+CACHE_MAX_AGE = 300
+
+# template output is flushed every few cards instead of after the whole page
+STREAM_BUFFER = 5
+
+# cards per page by default / at most (?limit=)
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# rows pulled from SQLite per fetchmany() round trip
+FETCH_BATCH = 32
+
+# pages kept in memory, least recently used dropped first; shared by all worker threads
+ROWS_MEMO_SIZE = 256
+RowsKey = Tuple[Any, ...]
+_ROWS_MEMO: "OrderedDict[RowsKey, Tuple[sqlite3.Row, ...]]" = OrderedDict()
+_ROWS_MEMO_LOCK = threading.Lock()
+
+# parsed once at import instead of on every request
+_TEMPLATE = app.jinja_env.from_string(PAGE)
+
+
+# one predicate per optional filter, in the order _filters() reads the args. `after` is the
+# keyset cursor for paging: the primary key index seeks straight to it, no OFFSET scan
+_FILTER_SQL = ("date >= ?", "date <= ?", "media_type = ?", "date < ?")
+
+
+def _where_sql(flags: Tuple[bool, ...]) -> str:
+    clauses = [sql for sql, on in zip(_FILTER_SQL, flags) if on]
+    return " WHERE " + " AND ".join(clauses) if clauses else ""
+
+
+# only the columns the page shows; the snippet/length are generated columns, so the full
+# explanation never crosses into Python
+_ROWS_SELECT = (
+    "SELECT date, title, explanation_snippet, explanation_len, "
+    "media_type, url, copyright, sentiment_compound AS sentiment FROM apod_entries"
+)
+
+# every filter combination spelled out once, keyed by which filters are set, so each request
+# reuses the same statement text and hits sqlite3's prepared-statement cache
+_QUERIES = {
+    flags: _ROWS_SELECT + _where_sql(flags) + " ORDER BY date DESC LIMIT ?"
+    for flags in product((False, True), repeat=len(_FILTER_SQL))
+}
+
+
+def _filters(
+    start: str | None, end: str | None, media: str | None, after: str | None
+) -> Tuple[Tuple[bool, ...], List[Any]]:
+    values = (start, end, media, after)
+    return tuple(bool(v) for v in values), [v for v in values if v]
+
+
+def fetch_rows(
+    start: str | None, end: str | None, media: str | None, after: str | None = None, limit: int = PAGE_SIZE
+) -> Iterator[sqlite3.Row]:
+    flags, params = _filters(start, end, media, after)
+    # sqlite3.Row already supports row['col'] in the template, so no per-row dict copy
+    cur = _get_conn().execute(_QUERIES[flags], [*params, limit])
+    cur.arraysize = FETCH_BATCH
+    while batch := cur.fetchmany():
+        yield from batch
+
+
+def _remember(key: RowsKey, rows: Tuple[sqlite3.Row, ...]) -> None:
+    with _ROWS_MEMO_LOCK:
+        _ROWS_MEMO[key] = rows
+        _ROWS_MEMO.move_to_end(key)
+        if len(_ROWS_MEMO) > ROWS_MEMO_SIZE:
+            _ROWS_MEMO.popitem(last=False)
+
+
+def _remembering(key: RowsKey, rows: Iterator[sqlite3.Row]) -> Iterator[sqlite3.Row]:
+    kept = []
     for row in rows:
-        data = dict(row)
-        text = data.get("explanation") or ""
-        data["sentiment"] = _sentiment.polarity_scores(text).get("compound", 0.0)
-        results.append(data)
-    return results
+        kept.append(row)
+        yield row
+    # only once the page rendered to the end; a dropped connection leaves nothing half-cached
+    _remember(key, tuple(kept))
+
+
+def page_rows(
+    start: str | None, end: str | None, media: str | None, after: str | None, limit: int, generation: int
+) -> Iterable[sqlite3.Row]:
+    """Rows for one page, memoized per filter + data generation.
+
+    `generation` is only part of the key: every pipeline write bumps it, so stale entries simply
+    stop being hit (the pipeline runs in another process and couldn't clear an in-memory cache
+    anyway). On a miss the rows go straight from the cursor into the template stream and are
+    remembered as they pass; a hit returns the shared tuple.
+    """
+    key = (start, end, media, after, limit, generation)
+    with _ROWS_MEMO_LOCK:
+        rows = _ROWS_MEMO.get(key)
+        if rows is not None:
+            _ROWS_MEMO.move_to_end(key)
+            return rows
+    return _remembering(key, fetch_rows(start, end, media, after, limit))
+
+
+def page_etag(
+    start: str | None, end: str | None, media: str | None, after: str | None, limit: int, generation: int
+) -> str:
+    """Fingerprint of the page; it only changes when the pipeline writes or the filters do."""
+    # STATIC_VERSION too: the page embeds the stylesheet URL
+    key = f"{generation}:{start}:{end}:{media}:{after}:{limit}:{STATIC_VERSION}"
+    return hashlib.md5(key.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+
+def _iso_date_arg(name: str) -> str | None:
+    """Read an optional date query arg as canonical YYYY-MM-DD, or reject the request with 400."""
+    raw = request.args.get(name)
+    if not raw:
+        return None
+    try:
+        parsed = dt.date.fromisoformat(raw)
+    except ValueError:
+        parsed = None
+    # same contract as the pipeline's parse_date: fromisoformat also takes 20240101 / 2024-W01-1
+    if parsed is None or parsed.isoformat() != raw:
+        abort(400, description=f"Invalid {name} date '{raw}', expected YYYY-MM-DD")
+    return raw
+
+
+def _limit_arg() -> int:
+    """Page size from ?limit=, clamped to 1..MAX_PAGE_SIZE; anything non-numeric is a 400."""
+    raw = request.args.get("limit")
+    if not raw:
+        return PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        abort(400, description=f"Invalid limit '{raw}', expected a number")
+    return max(1, min(limit, MAX_PAGE_SIZE))
 
 
 @app.route("/")
 def index():
-    start = request.args.get("start")
-    end = request.args.get("end")
+    start = _iso_date_arg("start")
+    end = _iso_date_arg("end")
     media = request.args.get("media") or None
-    rows = fetch_rows(start, end, media)
-    return render_template_string(PAGE, rows=rows, start=start or "", end=end or "", media=media or "")
+    after = _iso_date_arg("after")
+    limit = _limit_arg()
+
+    # the writers bump the generation on every upsert/backfill, so this is one header read
+    # instead of aggregating over the matching rows
+    generation = data_generation(_get_conn())
+    etag = page_etag(start, end, media, after, limit, generation)
+    if request.if_none_match.contains(etag):
+        # nothing changed since the browser's copy: skip the query and the render entirely
+        resp = app.response_class(status=304)
+    else:
+        stream = _TEMPLATE.stream(
+            rows=page_rows(start, end, media, after, limit, generation),
+            start=start or "",
+            end=end or "",
+            media=media or "",
+            static_version=STATIC_VERSION,
+            snippet_chars=SNIPPET_CHARS,
+            limit=limit,
+        )
+        stream.enable_buffering(STREAM_BUFFER)
+        # stream_with_context keeps the request around while Jinja renders (url_for needs it)
+        resp = app.response_class(stream_with_context(stream), mimetype="text/html")
+    resp.set_etag(etag)
+    resp.cache_control.max_age = CACHE_MAX_AGE
+    return resp
 
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    # local use only; each request gets its own thread so one slow page doesn't block the rest.
+    # For anything beyond that, run it under gunicorn (see the Procfile / README).
+    ensure_read_schema()
+    app.run(debug=True, port=5000, threaded=True)
@@ -0,0 +1,92 @@
+import datetime as dt
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src import mars_photos
+
+pytest.importorskip("aiohttp")
+
+
+def _photo(photo_id: int, earth_date: str, sol: int) -> dict:
+    return {
+        "id": photo_id,
+        "img_src": f"http://example.com/{photo_id}.jpg",
+        "earth_date": earth_date,
+        "sol": sol,
+        "rover": {"name": "Curiosity"},
+        "camera": {"full_name": "Mast Camera"},
+    }
+
+
+# what the fake API answers for each query string
+RESPONSES = {
+    "earth_date=2024-01-01": (200, {"photos": [_photo(1, "2024-01-01", 4050)]}),
+    "earth_date=2024-01-02": (404, {"errors": "No photos"}),
+    "sol=1000": (200, {"photos": [_photo(2, "2015-05-30", 1000), _photo(3, "2015-05-30", 1000)]}),
+    "sol=1001": (500, {"error": "boom"}),
+    "sol=1002": (403, {"error": "API_KEY_INVALID"}),
+}
+
+
+class _FakeMarsApi(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        query.pop("api_key", None)
+        key = "&".join(f"{name}={values[0]}" for name, values in query.items())
+        status, body = RESPONSES[key]
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeMarsApi)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    port = server.server_address[1]
+    monkeypatch.setattr(mars_photos, "_photos_url", lambda rover: f"http://127.0.0.1:{port}/{rover}/photos")
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_many_merges_date_and_sol_results(fake_api):
+    photos = mars_photos.fetch_mars_photos_many(
+        "KEY", "curiosity", earth_dates=[dt.date(2024, 1, 1)], sols=[1000], concurrency=2
+    )
+    assert [photo["id"] for photo in photos] == [1, 2, 3]
+    assert photos[0] == {
+        "id": 1,
+        "img_src": "http://example.com/1.jpg",
+        "earth_date": "2024-01-01",
+        "sol": 4050,
+        "rover": "Curiosity",
+        "camera": "Mast Camera",
+    }
+
+
+def test_fetch_many_returns_empty_list_on_404(fake_api):
+    assert mars_photos.fetch_mars_photos_many("KEY", "curiosity", earth_dates=[dt.date(2024, 1, 2)]) == []
+
+
+@pytest.mark.parametrize("sol, status", [(1001, 500), (1002, 403)])
+def test_fetch_many_raises_on_error_status(fake_api, sol, status):
+    with pytest.raises(RuntimeError, match=f"NASA Mars API error {status}"):
+        mars_photos.fetch_mars_photos_many("KEY", "curiosity", sols=[1000, sol])
+
+
+@pytest.mark.parametrize("concurrency", [0, -1])
+def test_fetch_many_rejects_concurrency_below_one(concurrency):
+    with pytest.raises(ValueError, match="at least 1"):
+        mars_photos.fetch_mars_photos_many("KEY", "curiosity", sols=[1000], concurrency=concurrency)
@@ -1,11 +1,15 @@
 import argparse
 import datetime as dt
 import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 
 import pytest
 
 from src import apod_pipeline as pipeline
+from src import schema, sentiment
+from src.http_session import build_session
 
 
 def test_resolve_date_range_with_start_only():
@@ -49,4 +53,263 @@ def test_persist_entries_upserts(tmp_path: Path):
 
     with sqlite3.connect(db_path) as con:
         title = con.execute("SELECT title FROM apod_entries WHERE date='2024-01-01'").fetchone()[0]
-    assert title == "First-updated"
\ No newline at end of file
+    assert title == "First-updated"
+
+
+def _entry(date: str, title: str) -> dict:
+    return {
+        "date": date,
+        "title": title,
+        "explanation": None,
+        "media_type": "image",
+        "url": None,
+        "hdurl": None,
+        "thumbnail_url": None,
+        "service_version": None,
+        "copyright": None,
+    }
+
+
+def test_persist_entries_uses_wal_journal(tmp_path: Path):
+    db_path = tmp_path / "apod.db"
+    pipeline.persist_entries(str(db_path), [_entry("2024-01-02", "Second")])
+
+    with sqlite3.connect(db_path) as con:
+        journal_mode = con.execute("PRAGMA journal_mode").fetchone()[0]
+    assert journal_mode == "wal"
+
+
+def test_persist_entries_spans_multiple_chunks(tmp_path: Path):
+    db_path = tmp_path / "apod.db"
+    start = dt.date(2020, 1, 1)
+    entries = [_entry((start + dt.timedelta(days=i)).isoformat(), f"Day {i}") for i in range(250)]
+
+    assert pipeline.persist_entries(str(db_path), entries) == 250
+
+    with sqlite3.connect(db_path) as con:
+        count = con.execute("SELECT COUNT(*) FROM apod_entries").fetchone()[0]
+        last_title = con.execute("SELECT title FROM apod_entries ORDER BY date DESC LIMIT 1").fetchone()[0]
+    assert count == 250
+    assert last_title == "Day 249"
+
+
+def test_backoff_delay_grows_and_honors_retry_after():
+    assert 2 <= pipeline._backoff_delay(retry_wait=1, attempt=1) < 2.5
+    assert pipeline._backoff_delay(retry_wait=5, attempt=10) < pipeline.MAX_BACKOFF_SECONDS + 0.5
+    assert pipeline._backoff_delay(retry_wait=1, attempt=0, retry_after=30) == 30
+
+
+def test_token_bucket_waits_for_the_next_token_once_empty(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(pipeline.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(pipeline.time, "sleep", fake_sleep)
+
+    bucket = pipeline._TokenBucket(rate=0.5, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert sleeps == []
+
+    # a quarter second later only 0.125 of a token has refilled
+    clock[0] += 0.25
+    bucket.acquire()
+    assert sleeps == [pytest.approx((1 - 0.125) / 0.5)]
+    assert bucket.tokens == pytest.approx(0)
+
+
+class _FakeResponse:
+    def __init__(self, status_code, payload, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._payload = payload
+        self.text = str(payload)
+
+    def json(self):
+        return self._payload
+
+
+def test_fetch_apod_range_retries_after_rate_limit(monkeypatch):
+    responses = [
+        _FakeResponse(429, {"error": "slow down"}, headers={"Retry-After": "2"}),
+        _FakeResponse(200, [{"date": "2024-01-01", "title": "First"}, {"date": "2024-01-02"}]),
+    ]
+    sleeps = []
+    monkeypatch.setattr(pipeline._SESSION, "get", lambda *args, **kwargs: responses.pop(0))
+    monkeypatch.setattr(pipeline.time, "sleep", sleeps.append)
+
+    entries = pipeline.fetch_apod_range(dt.date(2024, 1, 1), dt.date(2024, 1, 2), api_key="test-key", retry_wait=1)
+
+    title_idx = pipeline.APOD_COLUMNS.index("title")
+    assert [e[title_idx] for e in entries] == ["First"]
+    assert len(sleeps) == 1 and sleeps[0] >= 2
+
+
+def test_fetch_apod_range_rate_limit_is_not_retried_twice(monkeypatch):
+    hits = []
+
+    class RateLimited(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RateLimited)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(pipeline, "API_URL", f"http://127.0.0.1:{server.server_address[1]}/apod")
+    monkeypatch.setattr(pipeline, "_SESSION", build_session())
+    monkeypatch.setattr(pipeline.time, "sleep", lambda seconds: None)
+    try:
+        with pytest.raises(RuntimeError, match="429"):
+            pipeline.fetch_apod_range(dt.date(2024, 1, 1), dt.date(2024, 1, 2), api_key="test-key", retries=3)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # only our own loop retries a 429 (and paces each try); the adapter must not add more
+    assert len(hits) == 4
+
+
+def test_persist_entries_bulk_rebuilds_secondary_indexes(tmp_path: Path):
+    db_path = tmp_path / "apod.db"
+    pipeline.persist_entries(str(db_path), [_entry("2024-01-03", "Third")], bulk=True)
+
+    with sqlite3.connect(db_path) as con:
+        indexes = {row[1] for row in con.execute("PRAGMA index_list('apod_entries')")}
+    assert set(schema.SECONDARY_INDEXES) <= indexes
+
+
+def test_parse_date_accepts_only_dashed_iso():
+    assert pipeline.parse_date("2024-01-05") == dt.date(2024, 1, 5)
+    for bad in ("20240105", "2024-1-5", "2024-02-30"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            pipeline.parse_date(bad)
+
+
+def test_persist_entries_accepts_generator(tmp_path: Path):
+    db_path = tmp_path / "apod.db"
+    entries = (_entry(f"2023-01-{day:02d}", f"Day {day}") for day in range(1, 32))
+
+    assert pipeline.persist_entries(str(db_path), entries) == 31
+    assert pipeline.persist_entries(str(db_path), iter([])) == 0
+
+
+def test_persist_entries_stores_sentiment(tmp_path: Path):
+    db_path = tmp_path / "apod.db"
+    entry = _entry("2024-01-04", "Fourth")
+    entry["explanation"] = "A wonderful, beautiful galaxy."
+    pipeline.persist_entries(str(db_path), [entry])
+
+    with sqlite3.connect(db_path) as con:
+        score = con.execute("SELECT sentiment_compound FROM apod_entries").fetchone()[0]
+    assert score > 0
+
+
+def test_backfill_sentiment_adds_column_and_scores_old_rows(tmp_path: Path):
+    db_path = tmp_path / "apod.db"
+    with sqlite3.connect(db_path) as con:
+        # table layout from before sentiment_compound existed
+        con.execute(
+            "CREATE TABLE apod_entries (date TEXT PRIMARY KEY, title TEXT NOT NULL, explanation TEXT, media_type TEXT)"
+        )
+        con.execute("INSERT INTO apod_entries VALUES ('2024-01-05', 'Old', 'A terrible, awful storm.', 'image')")
+
+    assert pipeline.backfill_sentiment(str(db_path)) == 1
+    assert pipeline.backfill_sentiment(str(db_path)) == 0
+
+    with sqlite3.connect(db_path) as con:
+        score = con.execute("SELECT sentiment_compound FROM apod_entries").fetchone()[0]
+    assert score < 0
+
+
+def test_every_write_bumps_the_data_generation(tmp_path: Path):
+    db_path = tmp_path / "apod.db"
+    pipeline.persist_entries(str(db_path), [_entry("2024-01-01", "First")])
+    # same rows again: nothing visible changes, but readers still have to revalidate
+    pipeline.persist_entries(str(db_path), [_entry("2024-01-01", "First")])
+    with sqlite3.connect(db_path) as con:
+        assert schema.data_generation(con) == 2
+        con.execute("UPDATE apod_entries SET sentiment_compound = NULL")
+
+    assert pipeline.backfill_sentiment(str(db_path)) == 1
+    assert pipeline.backfill_sentiment(str(db_path)) == 0
+    with sqlite3.connect(db_path) as con:
+        assert schema.data_generation(con) == 3
+
+
+def test_batch_scorer_pool_matches_serial_scores():
+    texts = ["A wonderful, beautiful galaxy.", "A terrible, awful storm.", "", None] * 10
+    expected = [sentiment.compound(text) for text in texts]
+
+    with sentiment.BatchScorer(max_workers=2, parallel_min=0) as score:
+        assert score(texts) == expected
+
+
+def test_persist_entries_rescores_only_changed_explanations(tmp_path: Path, monkeypatch):
+    db_path = tmp_path / "apod.db"
+    kept, edited = _entry("2024-03-01", "Kept"), _entry("2024-03-02", "Edited")
+    kept["explanation"] = edited["explanation"] = "A wonderful, beautiful galaxy."
+    pipeline.persist_entries(str(db_path), [kept, edited])
+
+    scored = []
+    real_compound = sentiment.compound
+    monkeypatch.setattr(sentiment, "compound", lambda text: scored.append(text) or real_compound(text))
+    edited["explanation"] = "A terrible, awful storm."
+    pipeline.persist_entries(str(db_path), [kept, edited])
+
+    assert scored == ["A terrible, awful storm."]
+    with sqlite3.connect(db_path) as con:
+        scores = dict(con.execute("SELECT title, sentiment_compound FROM apod_entries"))
+    assert scores["Kept"] > 0 > scores["Edited"]
+
+
+def test_ensure_schema_rebuilds_old_tables_with_stored_snippet_columns(tmp_path: Path):
+    db_path = tmp_path / "apod.db"
+    with sqlite3.connect(db_path) as con:
+        con.execute(
+            "CREATE TABLE apod_entries (date TEXT PRIMARY KEY, title TEXT NOT NULL, explanation TEXT, media_type TEXT)"
+        )
+        con.execute("INSERT INTO apod_entries VALUES ('2024-01-05', 'Old', ?, 'image')", ("x" * 300,))
+        con.execute("CREATE INDEX idx_apod_media_type ON apod_entries (media_type)")
+        assert schema.ensure_schema(con) is True
+        assert schema.ensure_schema(con) is False
+        indexes = {row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert "idx_apod_media_type" not in indexes and "idx_apod_media_date" in indexes
+        hidden = {row[1]: row[6] for row in con.execute("PRAGMA table_xinfo(apod_entries)")}
+        title, snippet, length = con.execute(
+            "SELECT title, explanation_snippet, explanation_len FROM apod_entries"
+        ).fetchone()
+    assert hidden["explanation_snippet"] == hidden["explanation_len"] == 3  # STORED
+    assert title == "Old"
+    assert snippet == "x" * schema.SNIPPET_CHARS
+    assert length == 300
+
+
+def test_ensure_schema_turns_virtual_snippet_columns_into_stored_ones(tmp_path: Path):
+    db_path = tmp_path / "apod.db"
+    pipeline.persist_entries(str(db_path), [_entry("2024-01-05", "Scored")])
+    with sqlite3.connect(db_path) as con:
+        # the layout an earlier ensure_schema left behind: ALTER TABLE could only add VIRTUAL columns
+        con.execute("ALTER TABLE apod_entries DROP COLUMN explanation_len")
+        con.execute(
+            "ALTER TABLE apod_entries ADD COLUMN "
+            "explanation_len INTEGER GENERATED ALWAYS AS (length(explanation)) VIRTUAL"
+        )
+        before = con.execute("SELECT date, title, sentiment_compound, fetched_at FROM apod_entries").fetchall()
+
+        assert schema.ensure_schema(con) is True
+        hidden = {row[1]: row[6] for row in con.execute("PRAGMA table_xinfo(apod_entries)")}
+        after = con.execute("SELECT date, title, sentiment_compound, fetched_at FROM apod_entries").fetchall()
+    assert hidden["explanation_len"] == 3
+    assert after == before
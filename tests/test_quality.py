@@ -51,4 +51,20 @@ def test_validate_apod_flags_missing_and_invalid():
     assert report["invalid_dates"]["invalid_format_count"] == 1
     assert report["duplicates"]["by_date"] >= 2
     assert report["invalid_media_type"]["count"] == 1
-    assert report["empty_strings"]["explanation"] >= 2
\ No newline at end of file
+    assert report["empty_strings"]["explanation"] >= 2
+
+
+def test_validate_apod_flags_out_of_range_dates():
+    df = pd.DataFrame(
+        [
+            {"date": "1990-01-01", "title": "Before APOD", "explanation": "x", "media_type": "image", "url": "u"},
+            {"date": "2999-01-01", "title": "Future", "explanation": "x", "media_type": "image", "url": "u"},
+            {"date": None, "title": "No date", "explanation": "x", "media_type": "image", "url": "u"},
+            {"date": "2024-02-30", "title": "Impossible day", "explanation": "x", "media_type": "image", "url": "u"},
+        ]
+    )
+
+    report = validate_apod(df)
+
+    assert report["invalid_dates"]["out_of_range_count"] == 2
+    assert report["invalid_dates"]["invalid_format_count"] == 2
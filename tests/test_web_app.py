@@ -0,0 +1,157 @@
+import datetime as dt
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from src import apod_pipeline as pipeline
+from src import web_app
+
+
+@pytest.fixture
+def client(tmp_path: Path, monkeypatch):
+    db_path = tmp_path / "apod.db"
+    start = dt.date(2024, 1, 1)
+    entries = [
+        {
+            "date": (start + dt.timedelta(days=i)).isoformat(),
+            "title": f"Day {i}",
+            "explanation": "A beautiful galaxy. " * 20,
+            "media_type": "video" if i % 3 == 0 else "image",
+            "url": f"http://example.com/{i}",
+            "hdurl": None,
+            "thumbnail_url": None,
+            "service_version": "v1",
+            "copyright": None,
+        }
+        for i in range(10)
+    ]
+    pipeline.persist_entries(str(db_path), entries)
+    monkeypatch.setattr(web_app, "DB_PATH", db_path)
+    # drop any connection a previous test left on this thread
+    monkeypatch.setattr(web_app, "_local", web_app.threading.local())
+    web_app._ROWS_MEMO.clear()
+    return web_app.app.test_client()
+
+
+def test_index_filters_by_media(client):
+    resp = client.get("/?media=video")
+    assert resp.status_code == 200
+    assert resp.get_data(as_text=True).count('class="card"') == 4
+
+
+def test_index_returns_304_for_matching_etag(client):
+    first = client.get("/?media=image")
+    assert first.status_code == 200
+    assert first.headers["ETag"]
+
+    second = client.get("/?media=image", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+    assert second.data == b""
+
+
+def test_index_shows_new_rows_after_ingest(client):
+    assert "Brand new" not in client.get("/").get_data(as_text=True)
+
+    pipeline.persist_entries(
+        str(web_app.DB_PATH),
+        [{"date": "2024-02-01", "title": "Brand new", "explanation": "x", "media_type": "image", "url": "u"}],
+    )
+
+    assert "Brand new" in client.get("/").get_data(as_text=True)
+
+
+def test_index_shows_backfilled_sentiment(client):
+    # an older database: rows stored before sentiment was computed at ingest
+    with sqlite3.connect(web_app.DB_PATH) as con:
+        con.execute("UPDATE apod_entries SET sentiment_compound = NULL")
+    first = client.get("/")
+    assert "n/a" in first.get_data(as_text=True)
+
+    assert pipeline.backfill_sentiment(str(web_app.DB_PATH)) == 10
+
+    second = client.get("/", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert "n/a" not in second.get_data(as_text=True)
+
+
+def test_index_rejects_malformed_dates(client):
+    assert client.get("/?start=2024/01/01").status_code == 400
+    assert client.get("/?start=20240101").status_code == 400
+    assert client.get("/?end=2024-W01-1").status_code == 400
+    assert client.get("/?start=2024-01-03&end=").status_code == 200
+
+
+def test_stylesheet_is_served_as_a_cacheable_static_file(client):
+    page = client.get("/").get_data(as_text=True)
+    assert "<style>" not in page
+    assert "/static/style.css?v=" in page
+
+    css = client.get("/static/style.css")
+    assert css.status_code == 200
+    assert css.cache_control.max_age == 31536000
+
+
+def test_web_connection_is_read_only(client):
+    with pytest.raises(web_app.sqlite3.OperationalError):
+        web_app._get_conn().execute("DELETE FROM apod_entries")
+
+
+def test_index_pages_with_keyset_cursor(client):
+    first = client.get("/?limit=4").get_data(as_text=True)
+    assert first.count('class="card"') == 4
+    assert "2024-01-10" in first and "2024-01-07" in first
+    assert "after=2024-01-07" in first and "limit=4" in first
+
+    older = client.get("/?after=2024-01-07&limit=4").get_data(as_text=True)
+    assert older.count('class="card"') == 4
+    assert "2024-01-06" in older and "2024-01-07" not in older
+
+    last = client.get("/?after=2024-01-03&limit=4").get_data(as_text=True)
+    assert last.count('class="card"') == 2
+    assert "Older" not in last
+
+    assert client.get("/?limit=lots").status_code == 400
+    assert client.get("/?after=yesterday").status_code == 400
+
+
+def test_concurrent_workers_upgrade_an_old_database_once(tmp_path: Path):
+    db_path = tmp_path / "apod.db"
+    with sqlite3.connect(db_path) as con:
+        con.execute(
+            "CREATE TABLE apod_entries (date TEXT PRIMARY KEY, title TEXT NOT NULL, explanation TEXT, media_type TEXT)"
+        )
+        con.execute("INSERT INTO apod_entries VALUES ('2024-01-05', 'Old', 'x', 'image')")
+
+    # like gunicorn workers importing the app at the same time
+    barrier = threading.Barrier(4)
+
+    def boot():
+        barrier.wait()
+        web_app.ensure_read_schema(db_path)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for future in [pool.submit(boot) for _ in range(4)]:
+            future.result()
+
+    with sqlite3.connect(db_path) as con:
+        columns = [row[1] for row in con.execute("PRAGMA table_xinfo(apod_entries)")]
+    assert columns.count("sentiment_compound") == 1
+
+
+def test_repeat_page_is_served_from_the_memo(client, monkeypatch):
+    first = client.get("/?media=image").get_data(as_text=True)
+    assert len(web_app._ROWS_MEMO) == 1
+
+    def no_query(*args, **kwargs):
+        raise AssertionError("memo hit should not query SQLite")
+
+    monkeypatch.setattr(web_app, "fetch_rows", no_query)
+    assert client.get("/?media=image").get_data(as_text=True) == first
+
+
+def test_index_says_when_nothing_matches(client):
+    assert "No entries found" in client.get("/?start=2030-01-01").get_data(as_text=True)